@@ -8,6 +8,8 @@ SLACK_BOT_TOKEN = os.environ.get('SLACK_BOT_TOKEN')
 
 GROQ_TOKEN = os.environ.get('GROQ_TOKEN')
 
+AGGREGATE_DB_PATH = os.environ.get('AGGREGATE_DB_PATH', 'logs/aggregates.sqlite3')
+
 PROMPT1 = (
     "Act as a community manager. Analyze the community message using the provided JSON structure. Ensure the message "
     "complies with community guidelines Extract the following information in a valid JSON format with double quotes: "
@@ -43,6 +45,27 @@ groq_config = {
     "secondary_model": "gemma2-9b-it",
     "tertiary_model": "llama-3.1-70b-versatile",
     "quaternary_model": "llama3-8b-8192",
+    "substitute_models": ["mixtral-8x7b-32768", "llama-3.1-8b-instant", "gemma-7b-it"],
+    "backup_model": "llama-3.1-8b-instant",
+    "circuit_failure_threshold": 3,
+    "circuit_reset_timeout": 60,
+    "hedge_min_samples": 20,
+    "hedge_delay": 10.0,
     "prompt_group1": PROMPT1,
-    "prompt_group2": PROMPT2
+    "prompt_group2": PROMPT2,
+    "triage_model_path": os.environ.get('TRIAGE_MODEL_PATH', 'models/triage.npz'),
+    "triage_threshold": float(os.environ.get('TRIAGE_THRESHOLD', 0.9))
+}
+
+scheduler_config = {
+    "max_tokens": int(os.environ.get('MAX_RUN_TOKENS', 200000)),
+    "max_requests": int(os.environ.get('MAX_RUN_REQUESTS', 2000)),
+    "deadline": int(os.environ.get('MAX_RUN_SECONDS', 1800)),
+    "deferred_path": os.environ.get('DEFERRED_QUEUE_PATH', 'logs/deferred_queue.json'),
+    "weights": {
+        "recency": 1.0,
+        "replies": 0.5,
+        "reactions": 0.3,
+        "flags": 1.0
+    }
 }
@@ -0,0 +1,65 @@
+import json
+import time
+import random
+import httpx
+from types import SimpleNamespace
+from groq import APIConnectionError
+from tabulate import tabulate
+from src.groq_client import MessageAnalyser
+from config import groq_config
+
+
+class FakeCompletions:
+    def __init__(self, failing_models=(), spike_rate=0.03, spike_latency=2.0, base_latency=0.05):
+        self.failing_models = set(failing_models)
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+        self.base_latency = base_latency
+        self.calls = {}
+
+    def create(self, messages, model, **kwargs):
+        self.calls[model] = self.calls.get(model, 0) + 1
+        if model in self.failing_models:
+            raise APIConnectionError(request=httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions'))
+
+        latency = self.base_latency
+        if random.random() < self.spike_rate:
+            latency = self.spike_latency
+        time.sleep(latency)
+
+        content = json.dumps({
+            "sentiment": "Neutral",
+            "compliance": "Not aggressive",
+            "tone": "Informal",
+            "recommended_action": "clarify"
+        })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class FakeGroq:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+
+def main():
+    completions = FakeCompletions()
+    config = dict(groq_config, hedge_min_samples=5, hedge_delay=0.5, triage_model_path=None)
+    analyser = MessageAnalyser(config, language='en', client=FakeGroq(completions))
+
+    for i in range(40):
+        if i == 20:
+            print(f"Decommissioning {groq_config['secondary_model']}")
+            completions.failing_models.add(groq_config['secondary_model'])
+        started = time.monotonic()
+        result = analyser.analyse(f'Test message {i}')
+        print(f"Message {i}: {time.monotonic() - started:.2f}s, "
+              f"compliance={result['compliance']['value']} ({result['compliance']['confidence']})")
+
+    headers = ["Model", "State", "Samples", "P50", "P95", "Calls"]
+    table_data = [[model, stats['state'], stats['samples'], stats['p50'], stats['p95'], completions.calls.get(model, 0)]
+                  for model, stats in analyser.model_report().items()]
+    print(tabulate(table_data, headers=headers, tablefmt="pretty"))
+
+
+if __name__ == "__main__":
+    main()
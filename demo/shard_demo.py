@@ -0,0 +1,77 @@
+import os
+import time
+import shutil
+import tempfile
+import pandas as pd
+from src.slack_client import SlackClient
+from src.groq_client import MessageAnalyser
+from src.sharding import ShardCoordinator, run_workers, merge_fragments
+from demo.failover_demo import FakeCompletions, FakeGroq
+from config import groq_config
+
+CHANNELS = [{'id': f'C{idx:03d}', 'name': f'channel-{idx}'} for idx in range(4)]
+LATEST = 1_700_006_400.0
+OLDEST = LATEST - 2 * 86400
+INTERVAL = 1800
+
+
+class FakeWebClient:
+    def __init__(self, latency=0.02):
+        self.latency = latency
+
+    def conversations_history(self, channel, inclusive, limit, oldest, latest, cursor):
+        time.sleep(self.latency)
+        first = int(oldest // INTERVAL) * INTERVAL
+        timestamps = [ts for ts in range(first, int(latest) + 1, INTERVAL)
+                      if (oldest <= ts <= latest if inclusive else oldest < ts < latest)]
+        offset = int(cursor or 0)
+        page = timestamps[offset:offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(timestamps) else ''
+        return {
+            'ok': True,
+            'messages': [{'ts': f'{ts:.6f}', 'user': f'U{ts % 7}', 'text': f'{channel} message {ts}'} for ts in page],
+            'response_metadata': {'next_cursor': next_cursor}
+        }
+
+
+def fake_slack_client():
+    return SlackClient('fake-token', client=FakeWebClient())
+
+
+def fake_analyser():
+    config = dict(groq_config, triage_model_path=None)
+    return MessageAnalyser(config, language='en', client=FakeGroq(FakeCompletions(spike_rate=0)))
+
+
+def run(workers, root):
+    work_dir = os.path.join(root, f'work-{workers}')
+    coordinator_path = os.path.join(work_dir, 'shards.sqlite3')
+    coordinator = ShardCoordinator(coordinator_path)
+    coordinator.plan(CHANNELS, OLDEST, LATEST, slice_seconds=6 * 3600)
+    coordinator.close()
+
+    started = time.monotonic()
+    processed = run_workers(workers, coordinator_path, work_dir, fake_slack_client, fake_analyser)
+    elapsed = time.monotonic() - started
+
+    output = os.path.join(root, f'logs-{workers}')
+    merge_fragments(work_dir, output)
+    merged = pd.concat([pd.read_parquet(os.path.join(output, name)) for name in sorted(os.listdir(output))])
+    return elapsed, processed, merged.sort_values(['Channel', 'Timestamp']).reset_index(drop=True)
+
+
+def main():
+    root = tempfile.mkdtemp()
+    try:
+        baseline_time, baseline_processed, baseline = run(1, root)
+        print(f"1 worker: {baseline_time:.2f}s, {baseline_processed} analysed, {len(baseline)} merged rows")
+        for workers in (2, 4):
+            elapsed, processed, merged = run(workers, root)
+            print(f"{workers} workers: {elapsed:.2f}s ({baseline_time / elapsed:.2f}x), {processed} analysed, "
+                  f"{len(merged)} merged rows, identical to 1 worker: {merged.equals(baseline)}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
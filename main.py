@@ -4,6 +4,8 @@ from utils.logger import CustomLogger
 from datetime import datetime, timedelta
 from src.slack_client import SlackClient
 from src.groq_client import MessageAnalyser
+from src.aggregate_store import AggregateStore
+from src.scheduler import AnalysisScheduler
 from config import *
 
 def convert_timestamp(ts):
@@ -16,6 +18,8 @@ def main():
         logger.info('Initializing Slack client and message analyser')
         client = SlackClient(SLACK_BOT_TOKEN)
         analyser = MessageAnalyser(groq_config, language='tr')
+        store = AggregateStore(AGGREGATE_DB_PATH)
+        scheduler = AnalysisScheduler(analyser, scheduler_config, store)
 
         logger.info('Fetching channels')
         channels_result = client.fetch_channels()
@@ -101,17 +105,30 @@ def main():
             sys.exit(1)
 
         messages = messages_result.get('data', [])
-        if not messages:
+        if not messages and not scheduler.pending(channel_name):
             logger.warning("No messages found.")
             sys.exit(1)
 
         logger.info(f'Analyzing {len(messages)} messages from channel: {channel_name}')
-        for message in messages:
-            response = analyser.analyse(message.get('text'))
-            message['analyzes'] = response
+        schedule_result = scheduler.run(messages, channel_name)
+        messages = schedule_result.get('data', [])
+        if schedule_result.get('deferred'):
+            print(f"{len(schedule_result['deferred'])} messages deferred to the next run due to budget limits.")
+
+        for model, stats in analyser.model_report().items():
+            logger.debug(f"Model {model}: circuit {stats['state']}, p50 {stats['p50']}, p95 {stats['p95']}")
+
+        triage = analyser.triage_report()
+        if triage['local'] + triage['remote']:
+            logger.info(f"Triage model answered {triage['local']} of {triage['local'] + triage['remote']} "
+                        f"messages ({triage['local_fraction']:.1%})")
 
         logger.info(f'Saving messages to Parquet file for channel: {channel_name}')
         client.save_messages_to_parquet(messages, channel_name, 'logs')
+
+        logger.info(f'Updating moderation aggregates for channel: {channel_name}')
+        store.update(messages, channel_name)
+        store.close()
         logger.info(f"Messages from channel {channel_name} have been successfully saved.")
         print(f"Messages from channel {channel_name} have been successfully saved.")
 
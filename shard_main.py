@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import argparse
+from utils.logger import CustomLogger
+from src.slack_client import SlackClient
+from src.aggregate_store import AggregateStore
+from src.scheduler import share_budget
+from src.sharding import ShardCoordinator, run_workers, merge_fragments
+from config import *
+
+
+def plan(args, logger):
+    client = SlackClient(SLACK_BOT_TOKEN)
+    channels_result = client.fetch_channels()
+    if not channels_result.get('success', False):
+        logger.error(f"Error fetching channel information: {channels_result.get('errors', 'Unknown error')}")
+        sys.exit(1)
+
+    channels = channels_result.get('data', [])
+    if args.channels:
+        channels = [channel for channel in channels if channel.get('name') in args.channels]
+
+    latest = time.time()
+    oldest = latest - args.days * 86400
+    coordinator = ShardCoordinator(args.coordinator)
+    count = coordinator.plan(channels, oldest, latest, slice_seconds=args.slice_hours * 3600)
+    coordinator.close()
+    print(f"Planned {count} shard tasks for {len(channels)} channels.")
+
+
+def work(args, logger):
+    # scheduler_config is the budget for this host's run, shared between its worker processes
+    processed = run_workers(args.workers, args.coordinator, args.work_dir,
+                            budget_config=share_budget(scheduler_config, args.workers))
+    coordinator = ShardCoordinator(args.coordinator)
+    logger.info(f'Shard progress: {coordinator.progress()}')
+    coordinator.close()
+    print(f"Workers analysed {processed} messages.")
+
+
+def merge(args, logger):
+    store = AggregateStore(AGGREGATE_DB_PATH)
+    result = merge_fragments(args.work_dir, args.output, store)
+    store.close()
+    if not result.get('success', False):
+        logger.error(f"Error merging fragments: {result.get('errors', 'Unknown error')}")
+        sys.exit(1)
+    print(f"Merged fragments into {len(result['data'])} files.")
+
+
+def main():
+    logger = CustomLogger().get_logger()
+
+    parser = argparse.ArgumentParser(description='Sharded Slack crawl and analysis')
+    parser.add_argument('--coordinator', default='work/shards.sqlite3',
+                        help='Shared SQLite task database; across hosts it must be on a filesystem with '
+                             'working file locks')
+    parser.add_argument('--work-dir', default='work', help='Shared directory for Parquet fragments')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan', help='Split channels and time ranges into shard tasks')
+    plan_parser.add_argument('--days', type=float, default=7)
+    plan_parser.add_argument('--slice-hours', type=float, default=24)
+    plan_parser.add_argument('--channels', nargs='*', help='Channel names to include (default: all)')
+
+    work_parser = subparsers.add_parser('work', help='Run worker processes on this host until no tasks remain')
+    work_parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    merge_parser = subparsers.add_parser('merge', help='Merge worker fragments, deduped by (channel, ts)')
+    merge_parser.add_argument('--output', default='logs')
+
+    args = parser.parse_args()
+    {'plan': plan, 'work': work, 'merge': merge}[args.command](args, logger)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import os
+import glob
+import time
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+from utils.logger import CustomLogger
+
+
+# Hourly buckets so '1d' is a rolling 24 hours rather than the current calendar day
+SECONDS_PER_HOUR = 3600
+WINDOWS = {'1d': 24, '7d': 24 * 7, '30d': 24 * 30}
+COUNTERS = ['messages', 'aggressive', 'flagged', 'positive', 'negative', 'neutral']
+
+# Analysis values are stored in English or Turkish depending on MessageAnalyser.language
+AGGRESSIVE_VALUES = {'Aggressive', 'Agresif'}
+FLAG_VALUES = {'flag', 'işaretle'}
+SENTIMENT_VALUES = {
+    'Positive': 'positive', 'Pozitif': 'positive',
+    'Negative': 'negative', 'Negatif': 'negative',
+    'Neutral': 'neutral', 'Nötr': 'neutral',
+}
+
+
+class AggregateStore:
+    def __init__(self, db_path):
+        self._logger = CustomLogger().get_logger()
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._max_span = max(WINDOWS.values())
+        self._create_tables()
+        self._logger.debug(f'Aggregate store initialized at {db_path}')
+
+    def _create_tables(self):
+        counters = ', '.join(f'{counter} INTEGER NOT NULL DEFAULT 0' for counter in COUNTERS)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS seen (channel TEXT, ts TEXT, hour INTEGER, '
+                               'PRIMARY KEY (channel, ts))')
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS buckets (scope TEXT, key TEXT, hour INTEGER, {counters}, '
+                               'PRIMARY KEY (scope, key, hour))')
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS totals (scope TEXT, key TEXT, span INTEGER, {counters}, '
+                               'PRIMARY KEY (scope, key, span))')
+
+    @staticmethod
+    def _hour(timestamp):
+        return int(float(timestamp) // SECONDS_PER_HOUR)
+
+    def _current_hour(self, now):
+        return self._hour(time.time() if now is None else now)
+
+    @staticmethod
+    def _counts(compliance, action, sentiment):
+        counts = dict.fromkeys(COUNTERS, 0)
+        counts['messages'] = 1
+        counts['aggressive'] = int(compliance in AGGRESSIVE_VALUES)
+        counts['flagged'] = int(action in FLAG_VALUES)
+        mood = SENTIMENT_VALUES.get(sentiment)
+        if mood:
+            counts[mood] = 1
+        return counts
+
+    def _add(self, table, key_columns, key_values, counts, sign=1):
+        columns = ', '.join([*key_columns, *COUNTERS])
+        placeholders = ', '.join('?' * (len(key_columns) + len(COUNTERS)))
+        updates = ', '.join(f'{counter} = {counter} + excluded.{counter}' for counter in COUNTERS)
+        self._conn.execute(
+            f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+            f'ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET {updates}',
+            [*key_values, *(sign * counts[counter] for counter in COUNTERS)]
+        )
+
+    def _advance(self, current_hour):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'as_of_hour'").fetchone()
+        as_of = row[0] if row else None
+        if as_of is not None and current_hour <= as_of:
+            return
+
+        if as_of is not None:
+            sums = ', '.join(f'SUM({counter})' for counter in COUNTERS)
+            for span in WINDOWS.values():
+                # Hours that were inside the window at as_of but fall outside it at current_hour
+                expired = self._conn.execute(
+                    f'SELECT scope, key, {sums} FROM buckets WHERE hour > ? AND hour <= ? GROUP BY scope, key',
+                    (as_of - span, min(as_of, current_hour - span))
+                ).fetchall()
+                for scope, key, *values in expired:
+                    self._add('totals', ['scope', 'key', 'span'], [scope, key, span],
+                              dict(zip(COUNTERS, values)), sign=-1)
+            self._conn.execute('DELETE FROM totals WHERE messages <= 0')
+
+        self._conn.execute('DELETE FROM buckets WHERE hour <= ?', (current_hour - self._max_span,))
+        self._conn.execute('DELETE FROM seen WHERE hour <= ?', (current_hour - self._max_span,))
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('as_of_hour', ?)", (current_hour,))
+
+    def _record(self, channel, ts, user, compliance, action, sentiment, current_hour):
+        hour = min(self._hour(ts), current_hour)
+        if hour <= current_hour - self._max_span:
+            return False
+
+        inserted = self._conn.execute('INSERT OR IGNORE INTO seen (channel, ts, hour) VALUES (?, ?, ?)',
+                                      (channel, str(ts), hour)).rowcount
+        if not inserted:
+            return False
+
+        counts = self._counts(compliance, action, sentiment)
+        for scope, key in (('user', user), ('channel', channel)):
+            self._add('buckets', ['scope', 'key', 'hour'], [scope, key, hour], counts)
+            for span in WINDOWS.values():
+                if hour > current_hour - span:
+                    self._add('totals', ['scope', 'key', 'span'], [scope, key, span], counts)
+        return True
+
+    def analysed(self, channel, timestamps):
+        timestamps = [str(ts) for ts in timestamps]
+        found = set()
+        # Chunked to stay under SQLite's bound parameter limit
+        for start in range(0, len(timestamps), 500):
+            chunk = timestamps[start:start + 500]
+            rows = self._conn.execute(
+                f'SELECT ts FROM seen WHERE channel = ? AND ts IN ({", ".join("?" * len(chunk))})', [channel, *chunk]
+            ).fetchall()
+            found.update(ts for ts, in rows)
+        return found
+
+    def update(self, messages, channel, now=None):
+        current_hour = self._current_hour(now)
+        added = 0
+        with self._conn:
+            self._advance(current_hour)
+            for msg in messages:
+                analyzes = msg.get('analyzes')
+                if not isinstance(analyzes, dict) or 'ts' not in msg:
+                    continue
+                added += self._record(
+                    channel, msg['ts'], msg.get('user', 'N/A'),
+                    analyzes.get('compliance', {}).get('value'),
+                    analyzes.get('recommended_action', {}).get('value'),
+                    analyzes.get('sentiment', {}).get('value'),
+                    current_hour
+                )
+        self._logger.info(f'Aggregate store updated with {added} new messages for channel: {channel}')
+        return added
+
+    def update_from_frame(self, df, now=None):
+        current_hour = self._current_hour(now)
+        with self._conn:
+            self._advance(current_hour)
+            added = self._update_from_frame(df, None, current_hour)
+        self._logger.info(f'Aggregate store updated with {added} new messages')
+        return added
+
+    def _update_from_frame(self, df, channel, current_hour):
+        added = 0
+        for row in df.to_dict('records'):
+            ts = row.get('Timestamp')
+            if ts is None or ts == 'N/A' or pd.isna(ts):
+                if row.get('Date', 'N/A') == 'N/A':
+                    continue
+                ts = datetime.strptime(row['Date'], '%Y-%m-%d %H:%M:%S').timestamp()
+            added += self._record(
+                row.get('Channel', channel), ts, row.get('User', 'N/A'),
+                row.get('Community Compliance'), row.get('Recommended Action'), row.get('Sentiment'),
+                current_hour
+            )
+        return added
+
+    def rebuild(self, folder_path, now=None):
+        self._logger.info(f'Rebuilding aggregate store from {folder_path}')
+        current_hour = self._current_hour(now)
+        added = 0
+        with self._conn:
+            for table in ('meta', 'seen', 'buckets', 'totals'):
+                self._conn.execute(f'DELETE FROM {table}')
+            self._advance(current_hour)
+            for file_name in sorted(glob.glob(os.path.join(folder_path, '*.parquet'))):
+                # Files are named <channel>_<YYYYMMDD>.parquet
+                channel = os.path.basename(file_name).rsplit('_', 1)[0]
+                added += self._update_from_frame(pd.read_parquet(file_name), channel, current_hour)
+        self._logger.info(f'Aggregate store rebuilt with {added} messages')
+        return added
+
+    def _totals(self):
+        rows = self._conn.execute(f'SELECT scope, key, span, {", ".join(COUNTERS)} FROM totals').fetchall()
+        return {(scope, key, span): tuple(values) for scope, key, span, *values in rows}
+
+    def verify(self, folder_path, now=None):
+        current_hour = self._current_hour(now)
+        with self._conn:
+            self._advance(current_hour)
+        reference = AggregateStore(':memory:')
+        reference.rebuild(folder_path, now=now)
+
+        expected, actual = reference._totals(), self._totals()
+        mismatches = [
+            {'scope': key[0], 'key': key[1], 'span': key[2], 'expected': expected.get(key), 'actual': actual.get(key)}
+            for key in sorted(set(expected) | set(actual), key=str) if expected.get(key) != actual.get(key)
+        ]
+        if mismatches:
+            self._logger.warning(f'Aggregate store differs from {folder_path} in {len(mismatches)} rows')
+        else:
+            self._logger.info('Aggregate store matches the raw dataset')
+        return mismatches
+
+    def profile(self, scope, key, now=None):
+        with self._conn:
+            self._advance(self._current_hour(now))
+        rows = self._conn.execute(
+            f'SELECT span, {", ".join(COUNTERS)} FROM totals WHERE scope = ? AND key = ?', (scope, key)
+        ).fetchall()
+        by_span = {span: dict(zip(COUNTERS, values)) for span, *values in rows}
+
+        profile = {}
+        for name, span in WINDOWS.items():
+            counts = by_span.get(span, dict.fromkeys(COUNTERS, 0))
+            messages = counts['messages']
+            profile[name] = {
+                'messages': messages,
+                'aggressive_rate': counts['aggressive'] / messages if messages else 0.0,
+                'flag_count': counts['flagged'],
+                'sentiment': {mood: counts[mood] / messages if messages else 0.0
+                              for mood in ('positive', 'negative', 'neutral')}
+            }
+        return profile
+
+    def user_profile(self, user, now=None):
+        return self.profile('user', user, now)
+
+    def channel_profile(self, channel, now=None):
+        return self.profile('channel', channel, now)
+
+    def close(self):
+        self._conn.close()
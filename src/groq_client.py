@@ -1,16 +1,21 @@
+import os
 import time
 import json
-from groq import Groq, RateLimitError
+import threading
+from groq import Groq, APIError, RateLimitError
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from utils.logger import CustomLogger
+from src.model_pool import HedgeRace, ModelClaims, ModelPool
+from src.triage_classifier import TriageClassifier
 
 
 class MessageAnalyser:
-    def __init__(self, config, language='en'):
+    def __init__(self, config, language='en', client=None):
         self._logger = CustomLogger().get_logger()
         self.language = language
 
-        self._client = Groq(api_key=config['api_key'])
+        self._client = client or Groq(api_key=config['api_key'])
         self._logger.info("Initializing MessageAnalyser")
 
         self._primary_model = config['primary_model']
@@ -27,11 +32,50 @@ class MessageAnalyser:
         self._prompt_group2 = config["prompt_group2"]
         self._logger.debug(f'Prompt Group2: {self._prompt_group2} initialized')
 
+        self._slots = [
+            (self._primary_model, self._prompt_group1),
+            (self._secondary_model, self._prompt_group2),
+            (self._tertiary_model, self._prompt_group1),
+            (self._quaternary_model, self._prompt_group2),
+        ]
+        self._pool = ModelPool(
+            [model for model, _ in self._slots],
+            substitutes=config.get('substitute_models', []),
+            backup_model=config.get('backup_model'),
+            failure_threshold=config.get('circuit_failure_threshold', 3),
+            reset_timeout=config.get('circuit_reset_timeout', 60),
+            min_samples=config.get('hedge_min_samples', 20),
+            default_hedge_delay=config.get('hedge_delay', 10.0)
+        )
+        self._logger.debug(f"Substitute Models: {config.get('substitute_models', [])} initialized")
+        self._rate_limit_wait = config.get('rate_limit_wait', 60)
+        self._slot_executor = ThreadPoolExecutor(max_workers=len(self._slots))
+        self._request_executor = ThreadPoolExecutor(max_workers=config.get('max_workers', 16))
+
+        self._usage_lock = threading.Lock()
+        self._usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+
+        self._triage = None
+        self._triage_threshold = config.get('triage_threshold', 0.9)
+        self._triage_stats = {'local': 0, 'remote': 0}
+        triage_model_path = config.get('triage_model_path')
+        if triage_model_path and os.path.exists(triage_model_path):
+            self._triage = TriageClassifier.load(triage_model_path)
+            self._logger.debug(f'Triage model: {triage_model_path} initialized, threshold {self._triage_threshold}')
+        elif triage_model_path:
+            self._logger.warning(f'Triage model not found at {triage_model_path}, using LLM ensemble only')
+
     def _send_prompt(self, message, model, prompt,
-                     token=300, temperature=0.5, max_retries=3):
+                     token=300, temperature=0.5, max_retries=3, race=None):
+        if not self._pool.allow(model):
+            self._logger.warning(f'Circuit open for model {model}, skipping')
+            return {"error": "Circuit open"}
+
         retries = 0
         while retries < max_retries:
             self._logger.debug(f'Starting sending loop {retries}')
+            started = time.monotonic()
+            self._record_request()
             try:
                 response = self._client.chat.completions.create(
                     messages=[
@@ -46,25 +90,102 @@ class MessageAnalyser:
                     frequency_penalty=0.5,
                     presence_penalty=0.6
                 )
+                self._record_usage(getattr(response, 'usage', None))
 
                 if isinstance(response.choices[0].message.content, str):
                     response_content = json.loads(response.choices[0].message.content)
+                    # A call that lost its hedge race would drag p95 up until hedging stops
+                    won = race is None or race.finish()
+                    self._pool.record_success(model, time.monotonic() - started if won else None)
                     if self.language == 'tr':
                         response_content = self._translate_to_turkish(response_content)
                     return response_content
                 else:
+                    self._pool.record_failure(model)
                     self._logger.error(f'Invalid response from LLM - {model}')
                     return {"error": "Invalid response format"}
             except RateLimitError as e:
                 self._logger.warning('Model limit has been exceeded')
-                time.sleep(60)
+                self._pool.record_failure(model)
+                if not self._pool.is_available(model):
+                    return {"error": "Circuit open"}
+                time.sleep(self._rate_limit_wait)
                 retries += 1
             except json.JSONDecodeError as e:
+                self._pool.record_failure(model)
                 self._logger.error(f"JSON parsing error with model {model}: {e}")
                 return {"error": f"JSON parsing failed: {e}"}
+            except APIError as e:
+                self._pool.record_failure(model)
+                self._logger.error(f"API error with model {model}: {e}")
+                return {"error": f"API error: {e}"}
+            except Exception as e:
+                # Any other failure (e.g. an empty choices list) must still settle a half-open trial
+                self._pool.record_failure(model)
+                self._logger.error(f"Unexpected error with model {model}: {e}")
+                return {"error": f"Unexpected error: {e}"}
         self._logger.error(f"Max retries exceeded")
         return {"error": "Max retries exceeded"}
 
+    def _record_request(self):
+        with self._usage_lock:
+            self._usage['requests'] += 1
+
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        with self._usage_lock:
+            for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+                self._usage[key] += getattr(usage, key, 0) or 0
+
+    @staticmethod
+    def _is_error(result):
+        return not isinstance(result, dict) or 'error' in result
+
+    def _hedged_prompt(self, message, model, prompt, claims):
+        race = HedgeRace()
+        primary = self._request_executor.submit(self._send_prompt, message, model, prompt, race=race)
+        done, _ = wait([primary], timeout=self._pool.hedge_delay(model))
+        if done:
+            return primary.result()
+
+        backup = claims.claim(self._pool.backups(model))
+        if backup is None:
+            return primary.result()
+
+        self._logger.info(f'Model {model} exceeded its p95 latency, hedging with {backup}')
+        hedge = self._request_executor.submit(self._send_prompt, message, backup, prompt, race=race)
+
+        result = None
+        winner = None
+        pending = {primary, hedge}
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if not self._is_error(result):
+                    winner = future
+                    break
+
+        # The backup only fills this slot if its answer is the one used; otherwise other slots may take it
+        if winner is not hedge:
+            claims.release(backup)
+        return result
+
+    def _query_slot(self, message, model, prompt, claims):
+        # Substitutes and backups are claimed per analyse call, so one model never fills two slots
+        candidate = model if self._pool.is_available(model) else claims.claim(self._pool.substitutes())
+
+        result = {"error": "No available model"}
+        while candidate is not None:
+            if candidate != model:
+                self._logger.warning(f'Failing over from {model} to {candidate}')
+            result = self._hedged_prompt(message, candidate, prompt, claims)
+            if not self._is_error(result):
+                return result
+            candidate = claims.claim(self._pool.substitutes())
+        return result
+
     def _combine_results(self, *results):
         keys = ['sentiment', 'compliance', 'tone', 'recommended_action']
 
@@ -85,7 +206,8 @@ class MessageAnalyser:
 
             combined_result[key] = {
                 "value": most_common_value,
-                "confidence": confidence
+                "confidence": confidence,
+                "votes": len(value_list)
             }
 
         if self.language == 'tr':
@@ -125,14 +247,34 @@ class MessageAnalyser:
 
         self._logger.info('Starting message analyse')
         self._logger.debug(f'Message: {message}')
-        self._logger.debug(f'Sending value to model 1')
-        result1 = self._send_prompt(message, self._primary_model, self._prompt_group1)
-        self._logger.debug(f'Sending value to model 2')
-        result2 = self._send_prompt(message, self._secondary_model, self._prompt_group2)
-        self._logger.debug(f'Sending value to model 3')
-        result3 = self._send_prompt(message, self._tertiary_model, self._prompt_group1)
-        self._logger.debug(f'Sending value to model 4')
-        result4 = self._send_prompt(message, self._quaternary_model, self._prompt_group2)
-
-        results = self._combine_results(result1, result2, result3, result4)
+        if self._triage is not None:
+            local_result = self._triage.classify(message, self._triage_threshold)
+            if local_result is not None:
+                self._logger.debug('Message answered by triage model')
+                self._triage_stats['local'] += 1
+                return local_result
+            self._triage_stats['remote'] += 1
+
+        claims = ModelClaims(model for model, _ in self._slots)
+        futures = []
+        for idx, (model, prompt) in enumerate(self._slots, start=1):
+            self._logger.debug(f'Sending value to model {idx}')
+            futures.append(self._slot_executor.submit(self._query_slot, message, model, prompt, claims))
+
+        results = self._combine_results(*[future.result() for future in futures])
         return results
+
+    def triage_report(self):
+        total = self._triage_stats['local'] + self._triage_stats['remote']
+        return {
+            'local': self._triage_stats['local'],
+            'remote': self._triage_stats['remote'],
+            'local_fraction': self._triage_stats['local'] / total if total else 0.0
+        }
+
+    def model_report(self):
+        return self._pool.stats()
+
+    def usage_report(self):
+        with self._usage_lock:
+            return dict(self._usage)
@@ -0,0 +1,175 @@
+import time
+import threading
+from collections import deque
+from utils.logger import CustomLogger
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=60, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            # Let a single trial request through to probe the model
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+
+
+class LatencyTracker:
+    def __init__(self, window=100):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, latency):
+        self._samples.append(latency)
+
+    def percentile(self, percent):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HedgeRace:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def finish(self):
+        with self._lock:
+            first = not self._finished
+            self._finished = True
+            return first
+
+
+class ModelClaims:
+    def __init__(self, models=()):
+        self._lock = threading.Lock()
+        self._claimed = set(models)
+
+    def claim(self, candidates):
+        with self._lock:
+            for model in candidates:
+                if model not in self._claimed:
+                    self._claimed.add(model)
+                    return model
+        return None
+
+    def release(self, model):
+        with self._lock:
+            self._claimed.discard(model)
+
+
+class ModelPool:
+    def __init__(self, models, substitutes=None, backup_model=None, failure_threshold=3, reset_timeout=60,
+                 latency_window=100, min_samples=20, default_hedge_delay=10.0, clock=time.monotonic):
+        self._logger = CustomLogger().get_logger()
+        self._lock = threading.Lock()
+        self._models = list(models)
+        self._substitutes = [model for model in (substitutes or []) if model not in self._models]
+        self._backup_model = backup_model
+        self._min_samples = min_samples
+        self._default_hedge_delay = default_hedge_delay
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._latency_window = latency_window
+        self._clock = clock
+
+        self._breakers = {}
+        self._latencies = {}
+        for model in [*self._models, *self._substitutes, backup_model]:
+            if model:
+                self._ensure(model)
+
+    def _ensure(self, model):
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(self._failure_threshold, self._reset_timeout, self._clock)
+            self._latencies[model] = LatencyTracker(self._latency_window)
+
+    def allow(self, model):
+        with self._lock:
+            self._ensure(model)
+            return self._breakers[model].allow()
+
+    def is_available(self, model):
+        with self._lock:
+            self._ensure(model)
+            return self._breakers[model].state != CircuitBreaker.OPEN
+
+    def record_success(self, model, latency):
+        with self._lock:
+            self._ensure(model)
+            self._breakers[model].record_success()
+            if latency is not None:
+                self._latencies[model].record(latency)
+
+    def record_failure(self, model):
+        with self._lock:
+            self._ensure(model)
+            breaker = self._breakers[model]
+            was_open = breaker.state != CircuitBreaker.CLOSED
+            breaker.record_failure()
+            if not was_open and breaker.state == CircuitBreaker.OPEN:
+                self._logger.warning(f'Circuit opened for model {model}')
+
+    def hedge_delay(self, model):
+        with self._lock:
+            self._ensure(model)
+            latencies = self._latencies[model]
+            if len(latencies) < self._min_samples:
+                return self._default_hedge_delay
+            return min(latencies.percentile(95), self._default_hedge_delay)
+
+    def substitutes(self):
+        return [model for model in self._substitutes if self.is_available(model)]
+
+    def backups(self, model):
+        candidates = [self._backup_model] if self._backup_model and self.is_available(self._backup_model) else []
+        candidates.extend(self.substitutes())
+        return [candidate for candidate in candidates if candidate != model]
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {
+                    'state': self._breakers[model].state,
+                    'samples': len(self._latencies[model]),
+                    'p50': self._latencies[model].percentile(50),
+                    'p95': self._latencies[model].percentile(95)
+                } for model in self._breakers
+            }
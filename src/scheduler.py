@@ -0,0 +1,151 @@
+import os
+import json
+import math
+import time
+import heapq
+from utils.logger import CustomLogger
+
+
+class RunBudget:
+    def __init__(self, analyser, config):
+        self._analyser = analyser
+        self._max_tokens = config.get('max_tokens')
+        self._max_requests = config.get('max_requests')
+        self._deadline = config.get('deadline')
+        self._started = time.monotonic()
+        self._baseline = analyser.usage_report()
+        # Cost of the most expensive message seen so far, so a budget is not overrun by the next ones
+        self._estimate = {'seconds': 0.0, 'requests': 0, 'total_tokens': 0}
+
+    def elapsed(self):
+        return time.monotonic() - self._started
+
+    def used(self):
+        current = self._analyser.usage_report()
+        return {key: current[key] - self._baseline[key] for key in current}
+
+    def exhausted(self, count=1):
+        used = self.used()
+        if self._deadline is not None and self.elapsed() + count * self._estimate['seconds'] > self._deadline:
+            return 'deadline'
+        if (self._max_requests is not None
+                and used['requests'] + count * self._estimate['requests'] > self._max_requests):
+            return 'requests'
+        if (self._max_tokens is not None
+                and used['total_tokens'] + count * self._estimate['total_tokens'] > self._max_tokens):
+            return 'tokens'
+        return None
+
+    def analyse(self, text):
+        before = self._analyser.usage_report()
+        started = time.monotonic()
+        result = self._analyser.analyse(text)
+        after = self._analyser.usage_report()
+        self._estimate = {
+            'seconds': max(self._estimate['seconds'], time.monotonic() - started),
+            'requests': max(self._estimate['requests'], after['requests'] - before['requests']),
+            'total_tokens': max(self._estimate['total_tokens'], after['total_tokens'] - before['total_tokens'])
+        }
+        return result
+
+
+def share_budget(config, parts):
+    # Token and request budgets are split between parallel workers; the deadline is wall-clock for all.
+    # A share never drops to 0, which would read as no limit
+    return {
+        'max_tokens': max(1, config['max_tokens'] // parts) if config.get('max_tokens') else None,
+        'max_requests': max(1, config['max_requests'] // parts) if config.get('max_requests') else None,
+        'deadline': config.get('deadline')
+    }
+
+
+class AnalysisScheduler:
+    def __init__(self, analyser, config, aggregate_store=None):
+        self._logger = CustomLogger().get_logger()
+        self._analyser = analyser
+        self._store = aggregate_store
+
+        self._config = config
+        self._deferred_path = config.get('deferred_path', 'logs/deferred_queue.json')
+        self._weights = {'recency': 1.0, 'replies': 0.5, 'reactions': 0.3, 'flags': 1.0,
+                         **config.get('weights', {})}
+        self._logger.debug(f"Scheduler budgets: tokens {config.get('max_tokens')}, "
+                           f"requests {config.get('max_requests')}, deadline {config.get('deadline')}s")
+
+    def _load_deferred(self):
+        if not os.path.exists(self._deferred_path):
+            return {}
+        with open(self._deferred_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_deferred(self, deferred):
+        os.makedirs(os.path.dirname(self._deferred_path) or '.', exist_ok=True)
+        tmp_path = f'{self._deferred_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(deferred, f, ensure_ascii=False)
+        os.replace(tmp_path, self._deferred_path)
+
+    def pending(self, channel):
+        return len(self._load_deferred().get(channel, []))
+
+    def _user_flags(self, user, cache):
+        if self._store is None or user is None:
+            return 0
+        if user not in cache:
+            cache[user] = self._store.user_profile(user)['30d']['flag_count']
+        return cache[user]
+
+    def _priority(self, message, now, flag_cache):
+        age_hours = max(0.0, (now - float(message.get('ts', now))) / 3600)
+        reactions = sum(reaction.get('count', 0) for reaction in message.get('reactions', []))
+        return (
+            self._weights['recency'] / (1 + age_hours / 24)
+            + self._weights['replies'] * math.log1p(message.get('reply_count', 0))
+            + self._weights['reactions'] * math.log1p(reactions)
+            + self._weights['flags'] * math.log1p(self._user_flags(message.get('user'), flag_cache))
+        )
+
+    def run(self, messages, channel):
+        deferred = self._load_deferred()
+        queued = {message['ts']: message for message in deferred.get(channel, []) if 'ts' in message}
+        queued.update({message['ts']: message for message in messages if 'ts' in message})
+        if self._store is not None:
+            # The first verdict for a message is final, so never spend quota re-analysing one
+            for ts in self._store.analysed(channel, queued):
+                del queued[ts]
+        self._logger.info(f'Scheduling {len(queued)} messages for channel: {channel} '
+                          f'({len(deferred.get(channel, []))} deferred from previous runs)')
+
+        now = time.time()
+        flag_cache = {}
+        heap = [(-self._priority(message, now, flag_cache), ts) for ts, message in queued.items()]
+        heapq.heapify(heap)
+
+        budget = RunBudget(self._analyser, self._config)
+        analysed = []
+        stop_reason = None
+
+        while heap:
+            stop_reason = budget.exhausted()
+            if stop_reason:
+                break
+
+            _, ts = heapq.heappop(heap)
+            message = queued[ts]
+            message['analyzes'] = budget.analyse(message.get('text'))
+            analysed.append(message)
+
+        remaining = [queued[ts] for _, ts in sorted(heap)]
+        if remaining:
+            deferred[channel] = remaining
+            self._logger.warning(f'{stop_reason.capitalize()} budget reached, deferring {len(remaining)} '
+                                 f'messages for channel: {channel} to the next run')
+        else:
+            deferred.pop(channel, None)
+        self._save_deferred(deferred)
+
+        usage = budget.used()
+        self._logger.info(f"Analysed {len(analysed)} messages using {usage['requests']} requests and "
+                          f"{usage['total_tokens']} tokens in {budget.elapsed():.1f}s")
+
+        return {'success': True, 'data': analysed, 'deferred': remaining, 'usage': usage, 'errors': None}
@@ -0,0 +1,280 @@
+import os
+import glob
+import math
+import time
+import socket
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.logger import CustomLogger
+from src.slack_client import SlackClient
+from src.scheduler import RunBudget
+
+
+class ShardCoordinator:
+    def __init__(self, db_path, lease_seconds=900, max_attempts=3):
+        self._logger = CustomLogger().get_logger()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        # Autocommit mode so claims can take the write lock explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        # WAL needs shared memory between processes on one host, so hosts sharing the coordinator
+        # over a network directory must use the rollback journal and its file locks instead
+        self._conn.execute('PRAGMA journal_mode=DELETE')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'task_id TEXT PRIMARY KEY, channel_id TEXT, channel_name TEXT, oldest REAL, latest REAL, '
+            "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, claimed_at REAL, "
+            'attempts INTEGER NOT NULL DEFAULT 0, message_count INTEGER, error TEXT)'
+        )
+
+    def plan(self, channels, oldest, latest, slice_seconds=86400):
+        # Slices sit on a fixed grid of slice_seconds so re-planning yields the same task ids instead of
+        # overlapping ones; the slice still open at latest is left for a later plan once it has closed
+        first = math.floor(oldest / slice_seconds)
+        last = math.floor(latest / slice_seconds)
+        tasks = []
+        for channel in channels:
+            for index in range(first, last):
+                start, end = index * slice_seconds, (index + 1) * slice_seconds
+                task_id = f"{channel['id']}_{int(start)}_{int(end)}"
+                tasks.append((task_id, channel['id'], channel['name'], start, end))
+
+        self._conn.execute('BEGIN IMMEDIATE')
+        self._conn.executemany('INSERT OR IGNORE INTO tasks (task_id, channel_id, channel_name, oldest, latest) '
+                               'VALUES (?, ?, ?, ?, ?)', tasks)
+        self._conn.execute('COMMIT')
+        self._logger.info(f'Planned {len(tasks)} shard tasks for {len(channels)} channels')
+        return len(tasks)
+
+    def claim(self, worker_id):
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Newest slices first; tasks whose lease expired belonged to a crashed worker
+            row = self._conn.execute(
+                "SELECT task_id, channel_id, channel_name, oldest, latest FROM tasks "
+                "WHERE status = 'pending' OR (status = 'running' AND claimed_at < ?) "
+                "ORDER BY latest DESC, task_id LIMIT 1",
+                (now - self._lease_seconds,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE tasks SET status = 'running', worker = ?, claimed_at = ?, "
+                                   "attempts = attempts + 1 WHERE task_id = ?", (worker_id, now, row[0]))
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        if row is None:
+            return None
+        return dict(zip(['task_id', 'channel_id', 'channel_name', 'oldest', 'latest'], row))
+
+    @property
+    def lease_seconds(self):
+        return self._lease_seconds
+
+    # Every update below only applies while the worker still holds the lease, so a worker whose lease
+    # expired and whose task was re-claimed cannot overwrite the new owner's state
+    def heartbeat(self, task_id, worker_id):
+        return self._conn.execute(
+            "UPDATE tasks SET claimed_at = ? WHERE task_id = ? AND worker = ? AND status = 'running'",
+            (time.time(), task_id, worker_id)
+        ).rowcount > 0
+
+    def complete(self, task_id, worker_id, message_count):
+        return self._conn.execute(
+            "UPDATE tasks SET status = 'done', message_count = ?, error = NULL "
+            "WHERE task_id = ? AND worker = ? AND status = 'running'", (message_count, task_id, worker_id)
+        ).rowcount > 0
+
+    def split(self, task_id, worker_id, split_at, message_count):
+        # The analysed part [split_at, latest) is done; the rest becomes a smaller pending task
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._conn.execute(
+                "SELECT channel_id, channel_name, oldest FROM tasks WHERE task_id = ? AND worker = ? "
+                "AND status = 'running'", (task_id, worker_id)
+            ).fetchone()
+            if row is None:
+                self._conn.execute('ROLLBACK')
+                return None
+            channel_id, channel_name, oldest = row
+            remainder_id = f'{channel_id}_{int(oldest)}_{split_at}'
+            self._conn.execute('INSERT OR IGNORE INTO tasks (task_id, channel_id, channel_name, oldest, latest) '
+                               'VALUES (?, ?, ?, ?, ?)', (remainder_id, channel_id, channel_name, oldest, float(split_at)))
+            self._conn.execute("UPDATE tasks SET status = 'done', oldest = ?, message_count = ?, error = NULL "
+                               "WHERE task_id = ?", (float(split_at), message_count, task_id))
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        return remainder_id
+
+    def release(self, task_id, worker_id):
+        return self._conn.execute(
+            "UPDATE tasks SET status = 'pending', worker = NULL, claimed_at = NULL, attempts = attempts - 1 "
+            "WHERE task_id = ? AND worker = ? AND status = 'running'", (task_id, worker_id)
+        ).rowcount > 0
+
+    def fail(self, task_id, worker_id, error):
+        self._logger.warning(f'Shard task {task_id} failed: {error}')
+        return self._conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? "
+            "WHERE task_id = ? AND worker = ? AND status = 'running'", (self._max_attempts, error, task_id, worker_id)
+        ).rowcount > 0
+
+    def progress(self):
+        rows = self._conn.execute('SELECT status, COUNT(*), COALESCE(SUM(message_count), 0) FROM tasks '
+                                  'GROUP BY status').fetchall()
+        return {status: {'tasks': count, 'messages': messages} for status, count, messages in rows}
+
+    def close(self):
+        self._conn.close()
+
+
+def default_slack_client():
+    from config import SLACK_BOT_TOKEN
+    return SlackClient(SLACK_BOT_TOKEN)
+
+
+def default_analyser():
+    from config import groq_config
+    from src.groq_client import MessageAnalyser
+    return MessageAnalyser(groq_config, language='tr')
+
+
+def _write_fragment(df, file_name, worker_id):
+    tmp_name = f'{file_name}.{worker_id}.tmp'
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_name)
+    os.replace(tmp_name, file_name)
+
+
+def run_worker(worker_id, coordinator_path, work_dir, slack_factory=default_slack_client,
+               analyser_factory=default_analyser, budget_config=None):
+    logger = CustomLogger().get_logger()
+    coordinator = ShardCoordinator(coordinator_path)
+    client = slack_factory()
+    analyser = analyser_factory()
+    budget = RunBudget(analyser, budget_config or {})
+    fragments_dir = os.path.join(work_dir, 'fragments')
+    os.makedirs(fragments_dir, exist_ok=True)
+
+    processed = 0
+    while True:
+        task = coordinator.claim(worker_id)
+        if task is None:
+            break
+
+        logger.info(f"Worker {worker_id} processing shard {task['task_id']}")
+        try:
+            # Inclusive bounds so a message exactly on a slice edge is never lost, but only the slice
+            # starting at that edge analyses it; replies follow their root via thread_ts
+            messages_result = client.fetch_channel_messages(channel=task['channel_id'], inclusive=True,
+                                                            oldest=task['oldest'], latest=task['latest'])
+            if not messages_result.get('success', False):
+                raise RuntimeError(messages_result.get('errors', 'Unknown error'))
+
+            threads = {}
+            for message in messages_result.get('data', []):
+                root = message.get('thread_ts', message['ts'])
+                if float(root) < task['latest']:
+                    threads.setdefault(root, []).append(message)
+
+            # Newest threads first, checking the budget before each so a thread is never split
+            analysed = []
+            last_root = None
+            stop_reason = None
+            lease_lost = False
+            renewed_at = time.monotonic()
+            for root in sorted(threads, key=float, reverse=True):
+                # Renew the lease well before it expires so a long shard is not re-claimed mid-way
+                if time.monotonic() - renewed_at > coordinator.lease_seconds / 3:
+                    lease_lost = not coordinator.heartbeat(task['task_id'], worker_id)
+                    if lease_lost:
+                        break
+                    renewed_at = time.monotonic()
+                stop_reason = budget.exhausted(len(threads[root]))
+                if stop_reason:
+                    break
+                for message in threads[root]:
+                    message['analyzes'] = budget.analyse(message.get('text'))
+                analysed.extend(threads[root])
+                last_root = root
+
+            if lease_lost:
+                logger.warning(f"Worker {worker_id} lost the lease on shard {task['task_id']}, abandoning it")
+                continue
+
+            if stop_reason and not analysed:
+                # Leave the shard pending so the next run picks it up instead of dropping it
+                coordinator.release(task['task_id'], worker_id)
+                logger.warning(f"Worker {worker_id} {stop_reason} budget reached, deferring shard {task['task_id']}")
+                break
+
+            if analysed:
+                _write_fragment(client.build_message_frame(analysed, task['channel_name']),
+                                os.path.join(fragments_dir, f"{task['task_id']}.parquet"), worker_id)
+            processed += len(analysed)
+
+            if stop_reason:
+                remainder_id = coordinator.split(task['task_id'], worker_id, last_root, len(analysed))
+                if remainder_id is None:
+                    logger.warning(f"Worker {worker_id} lost the lease on shard {task['task_id']} before splitting it")
+                    break
+                logger.warning(f"Worker {worker_id} {stop_reason} budget reached after {len(analysed)} messages, "
+                               f"deferring the rest of shard {task['task_id']} as {remainder_id}")
+                break
+            if not coordinator.complete(task['task_id'], worker_id, len(analysed)):
+                logger.warning(f"Worker {worker_id} finished shard {task['task_id']} after losing its lease")
+        except Exception as e:
+            coordinator.fail(task['task_id'], worker_id, str(e))
+
+    coordinator.close()
+    logger.info(f'Worker {worker_id} finished after {processed} messages')
+    return processed
+
+
+def run_workers(workers, coordinator_path, work_dir, slack_factory=default_slack_client,
+                analyser_factory=default_analyser, worker_prefix=None, budget_config=None):
+    prefix = worker_prefix or f'{socket.gethostname()}-{os.getpid()}'
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_worker, f'{prefix}-{idx}', coordinator_path, work_dir,
+                                   slack_factory, analyser_factory, budget_config) for idx in range(workers)]
+        return sum(future.result() for future in futures)
+
+
+def merge_fragments(work_dir, folder_path, aggregate_store=None, now=None):
+    logger = CustomLogger().get_logger()
+    file_names = sorted(glob.glob(os.path.join(work_dir, 'fragments', '*.parquet')))
+    if not file_names:
+        logger.warning(f'No new fragments found in {work_dir}')
+        return {'success': False, 'data': [], 'errors': 'no_fragments'}
+
+    df = pd.concat([pd.read_parquet(file_name) for file_name in file_names], ignore_index=True)
+    total = len(df)
+    # Sort before deduping so the surviving row never depends on which worker finished first
+    df = (df.sort_values(['Channel', 'Timestamp', 'Message'], kind='mergesort')
+            .drop_duplicates(subset=['Channel', 'Timestamp'], keep='first')
+            .reset_index(drop=True))
+    logger.info(f'Merged {len(file_names)} fragments: {total} rows, {total - len(df)} duplicates removed')
+
+    os.makedirs(folder_path, exist_ok=True)
+    saved = []
+    for channel_name, channel_df in df.groupby('Channel', sort=True):
+        saved.append(SlackClient.write_message_frame(channel_df.reset_index(drop=True), channel_name, folder_path))
+
+    if aggregate_store is not None:
+        aggregate_store.update_from_frame(df, now=now)
+
+    # Merged fragments are moved aside so the next merge only applies new ones. A crash before this point
+    # is safe to retry: the daily files and the aggregate store both ignore messages they already hold
+    merged_dir = os.path.join(work_dir, 'merged')
+    os.makedirs(merged_dir, exist_ok=True)
+    for file_name in file_names:
+        os.replace(file_name, os.path.join(merged_dir, os.path.basename(file_name)))
+    return {'success': True, 'data': saved, 'errors': None}
@@ -1,3 +1,4 @@
+import os
 import re
 import time
 import logging
@@ -12,14 +13,14 @@ from utils.logger import CustomLogger
 
 
 class SlackClient:
-    def __init__(self, token):
+    def __init__(self, token, client=None):
         self._logger = CustomLogger().get_logger()
         if not token:
             self._logger.error("Slack token must be provided")
             raise ValueError("Slack token must be provided")
 
         self._logger.debug('Slack Client initialized')
-        self._client = WebClient(token=token)
+        self._client = client or WebClient(token=token)
 
     def fetch_channels(self, max_retries=3):
         self._logger.info('Fetching channels')
@@ -202,6 +203,11 @@ class SlackClient:
         return {'success': False, 'data': [], 'errors': 'max_retries_exceeded'}
     def save_messages_to_parquet(self, messages, channel_name, folder_path):
         self._logger.info(f'Saving messages to Parquet for channel: {channel_name}')
+        df = self.build_message_frame(messages, channel_name)
+        file_name = self.write_message_frame(df, channel_name, folder_path)
+        print(f"Messages saved to {file_name}")
+
+    def build_message_frame(self, messages, channel_name):
         log_data = []
         for msg in messages:
             user_id = msg.get('user', 'N/A')
@@ -223,8 +229,16 @@ class SlackClient:
             compliance = analyzes['compliance'].get('value') if analyzes != 'N/A' else 'N/A'
             tone = analyzes['tone'].get('value') if analyzes != 'N/A' else 'N/A'
             recommended_action = analyzes['recommended_action'].get('value') if analyzes != 'N/A' else 'N/A'
+            sentiment_confidence = analyzes['sentiment'].get('confidence') if analyzes != 'N/A' else 'N/A'
+            compliance_confidence = analyzes['compliance'].get('confidence') if analyzes != 'N/A' else 'N/A'
+            tone_confidence = analyzes['tone'].get('confidence') if analyzes != 'N/A' else 'N/A'
+            recommended_action_confidence = analyzes['recommended_action'].get('confidence') if analyzes != 'N/A' else 'N/A'
+            source = ('local' if recommended_action_confidence == 'LOCAL' else 'llm') if analyzes != 'N/A' else 'N/A'
+            votes = str(min(field.get('votes', 0) for field in analyzes.values())) if source == 'llm' else 'N/A'
 
             log_data.append({
+                "Channel": channel_name,
+                "Timestamp": ts,
                 "Date": time_str,
                 "User": user_id,
                 "Thread": is_thread,
@@ -235,13 +249,29 @@ class SlackClient:
                 "Sentiment": sentiment,
                 "Community Compliance": compliance,
                 "Language Tone": tone,
-                "Recommended Action": recommended_action
+                "Recommended Action": recommended_action,
+                "Sentiment Confidence": sentiment_confidence,
+                "Community Compliance Confidence": compliance_confidence,
+                "Language Tone Confidence": tone_confidence,
+                "Recommended Action Confidence": recommended_action_confidence,
+                "Source": source,
+                "Votes": votes
             })
 
-        # Create DataFrame and write to Parquet
-        df = pd.DataFrame(log_data)
+        return pd.DataFrame(log_data)
+
+    @staticmethod
+    def write_message_frame(df, channel_name, folder_path):
+        logger = CustomLogger().get_logger()
         file_name = f"{folder_path}/{channel_name}_{datetime.now().strftime('%Y%m%d')}.parquet"
-        table = pa.Table.from_pandas(df)
+        if os.path.exists(file_name):
+            # Merge with earlier runs of the same day instead of overwriting them; the first verdict
+            # for a message is kept, as in AggregateStore
+            existing = pq.read_table(file_name).to_pandas()
+            df = pd.concat([existing, df], ignore_index=True)
+            if 'Timestamp' in existing.columns:
+                df = df.drop_duplicates(subset='Timestamp', keep='first')
+        table = pa.Table.from_pandas(df, preserve_index=False)
         pq.write_table(table, file_name)
-        self._logger.info(f'Messages saved to {file_name}')
-        print(f"Messages saved to {file_name}")
+        logger.info(f'Messages saved to {file_name}')
+        return file_name
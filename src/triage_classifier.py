@@ -0,0 +1,240 @@
+import os
+import re
+import glob
+import zlib
+
+import numpy as np
+import pandas as pd
+from utils.logger import CustomLogger
+
+
+# Parquet column -> analysis key, matching SlackClient.save_messages_to_parquet
+LABEL_COLUMNS = {
+    'sentiment': 'Sentiment',
+    'compliance': 'Community Compliance',
+    'tone': 'Language Tone',
+    'recommended_action': 'Recommended Action',
+}
+
+# Confidence given to answers produced by the triage model itself, so they are never mistaken
+# for LLM consensus and fed back into training
+LOCAL_CONFIDENCE = 'LOCAL'
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+class TriageClassifier:
+    def __init__(self, n_features=2 ** 18, char_ngram=3, learning_rate=2.0, l2=1e-6, epochs=20,
+                 batch_size=64, seed=42):
+        self._logger = CustomLogger().get_logger()
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.seed = seed
+
+        self._classes = {}
+        self._weights = {}
+
+    @property
+    def is_trained(self):
+        return bool(self._weights)
+
+    def _hash(self, feature):
+        return zlib.crc32(feature.encode('utf-8')) % self.n_features
+
+    def _featurize(self, text):
+        tokens = _TOKEN_PATTERN.findall((text or '').lower())
+        features = ['b:']
+        features.extend(f'w:{token}' for token in tokens)
+        features.extend(f'bg:{first} {second}' for first, second in zip(tokens, tokens[1:]))
+        for token in tokens:
+            padded = f'<{token}>'
+            features.extend(f'c:{padded[i:i + self.char_ngram]}'
+                            for i in range(len(padded) - self.char_ngram + 1))
+
+        indices, counts = np.unique([self._hash(feature) for feature in features], return_counts=True)
+        values = counts.astype(np.float64)
+        values /= np.linalg.norm(values)
+        return indices, values
+
+    def _vectorize(self, texts):
+        indptr = [0]
+        indices = []
+        values = []
+        for text in texts:
+            doc_indices, doc_values = self._featurize(text)
+            indices.append(doc_indices)
+            values.append(doc_values)
+            indptr.append(indptr[-1] + len(doc_indices))
+        return np.array(indptr), np.concatenate(indices), np.concatenate(values)
+
+    @staticmethod
+    def _rows(matrix, rows):
+        indptr, indices, values = matrix
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = ends - starts
+        positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+        batch_indptr = np.concatenate(([0], lengths.cumsum()))
+        return batch_indptr, indices[positions], values[positions]
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _predict_proba(self, matrix, weights):
+        indptr, indices, values = matrix
+        # Every document carries the bias feature, so no row is empty for reduceat
+        logits = np.add.reduceat(weights[indices] * values[:, None], indptr[:-1], axis=0)
+        return self._softmax(logits)
+
+    def fit(self, texts, labels):
+        self._logger.info(f'Training triage classifier on {len(texts)} messages')
+        # A single-class field would score p=1.0 for every input and never hold a message back
+        single_class = [key for key, field_labels in labels.items() if len(set(field_labels)) < 2]
+        if single_class:
+            self._logger.error(f'Cannot train triage classifier, single class in: {single_class}')
+            raise ValueError(f"Training data has a single class for: {', '.join(single_class)}")
+
+        matrix = self._vectorize(texts)
+        rng = np.random.default_rng(self.seed)
+
+        for key, field_labels in labels.items():
+            classes, targets = np.unique(np.asarray(field_labels, dtype=object), return_inverse=True)
+            weights = np.zeros((self.n_features, len(classes)))
+            self._logger.debug(f'Fitting {key} with classes: {list(classes)}')
+
+            for epoch in range(self.epochs):
+                order = rng.permutation(len(texts))
+                for start in range(0, len(order), self.batch_size):
+                    rows = order[start:start + self.batch_size]
+                    batch = self._rows(matrix, rows)
+                    probs = self._predict_proba(batch, weights)
+                    probs[np.arange(len(rows)), targets[rows]] -= 1.0
+
+                    batch_indptr, batch_indices, batch_values = batch
+                    owner = np.repeat(np.arange(len(rows)), np.diff(batch_indptr))
+                    gradient = probs[owner] * batch_values[:, None] / len(rows)
+                    weights[batch_indices] *= 1.0 - self.learning_rate * self.l2
+                    np.add.at(weights, batch_indices, -self.learning_rate * gradient)
+
+            self._classes[key] = classes
+            self._weights[key] = weights
+
+        self._logger.info('Triage classifier trained')
+        return self
+
+    def predict(self, texts):
+        if not self.is_trained:
+            raise ValueError("Triage classifier has not been trained")
+
+        matrix = self._vectorize(texts)
+        predictions = [{} for _ in texts]
+        for key, weights in self._weights.items():
+            probs = self._predict_proba(matrix, weights)
+            best = probs.argmax(axis=1)
+            for row, prediction in enumerate(predictions):
+                prediction[key] = {
+                    "value": str(self._classes[key][best[row]]),
+                    "probability": float(probs[row, best[row]])
+                }
+        return predictions
+
+    def classify(self, message, threshold):
+        prediction = self.predict([message])[0]
+        probability = min(field['probability'] for field in prediction.values())
+        if probability < threshold:
+            self._logger.debug(f'Triage probability {probability:.3f} below threshold {threshold}')
+            return None
+
+        return {key: {"value": field['value'], "confidence": LOCAL_CONFIDENCE, "probability": field['probability']}
+                for key, field in prediction.items()}
+
+    def evaluate(self, texts, labels, threshold):
+        self._logger.info(f'Evaluating triage classifier on {len(texts)} held-out messages')
+        predictions = self.predict(texts)
+        total = len(predictions)
+
+        field_accuracy = {}
+        for key, field_labels in labels.items():
+            correct = sum(prediction[key]['value'] == label for prediction, label in zip(predictions, field_labels))
+            field_accuracy[key] = correct / total if total else 0.0
+
+        exact = [all(prediction[key]['value'] == labels[key][row] for key in labels)
+                 for row, prediction in enumerate(predictions)]
+        covered = [min(field['probability'] for field in prediction.values()) >= threshold
+                   for prediction in predictions]
+        covered_total = sum(covered)
+        covered_correct = sum(is_exact for is_exact, is_covered in zip(exact, covered) if is_covered)
+
+        return {
+            'samples': total,
+            'field_accuracy': field_accuracy,
+            'exact_match': sum(exact) / total if total else 0.0,
+            'threshold': threshold,
+            'coverage': covered_total / total if total else 0.0,
+            'covered_accuracy': covered_correct / covered_total if covered_total else 0.0
+        }
+
+    def save(self, path):
+        arrays = {'n_features': self.n_features, 'char_ngram': self.char_ngram}
+        for key in self._weights:
+            arrays[f'{key}__weights'] = self._weights[key]
+            arrays[f'{key}__classes'] = self._classes[key].astype(str)
+        np.savez_compressed(path, **arrays)
+        self._logger.info(f'Triage classifier saved to {path}')
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            model = cls(n_features=int(data['n_features']), char_ngram=int(data['char_ngram']))
+            for key in LABEL_COLUMNS:
+                if f'{key}__weights' in data:
+                    model._weights[key] = data[f'{key}__weights']
+                    model._classes[key] = data[f'{key}__classes'].astype(object)
+        model._logger.info(f'Triage classifier loaded from {path}')
+        return model
+
+
+def load_training_data(folder_path, holdout_ratio=0.2, min_votes=3):
+    logger = CustomLogger().get_logger()
+    label_columns = list(LABEL_COLUMNS.values())
+    confidence_columns = [f'{column} Confidence' for column in label_columns]
+    frames = []
+    for file_name in sorted(glob.glob(os.path.join(folder_path, '*.parquet'))):
+        df = pd.read_parquet(file_name)
+        if not all(column in df.columns for column in [*confidence_columns, 'Source', 'Votes']):
+            logger.warning(f'Skipping {file_name}: no confidence, source or vote columns')
+            continue
+
+        # Every LLM verdict is kept for evaluation; only unanimous ones with a quorum of votes train
+        llm = (df['Source'] == 'llm') & (df[label_columns] != 'N/A').all(axis=1)
+        df = df.loc[llm, ['Message', *label_columns]].assign(
+            Trainable=(df.loc[llm, confidence_columns] == 'HIGH').all(axis=1)
+            & (pd.to_numeric(df.loc[llm, 'Votes'], errors='coerce') >= min_votes)
+        )
+        frames.append(df)
+
+    if not frames:
+        logger.warning(f'No LLM-analysed history found in {folder_path}')
+        return {'train': ([], {}), 'holdout': ([], {})}
+
+    df = pd.concat(frames).drop_duplicates(subset='Message', keep='last')
+    df = df[df['Message'].notna() & (df['Message'] != 'N/A')]
+    logger.info(f"Loaded {len(df)} LLM-analysed messages from {folder_path}, "
+                f"{int(df['Trainable'].sum())} HIGH confidence with at least {min_votes} votes")
+
+    # Split on a hash of the text so the same message never lands on both sides
+    buckets = df['Message'].map(lambda text: zlib.crc32(text.encode('utf-8')) % 100)
+    is_holdout = buckets < int(holdout_ratio * 100)
+
+    def _split(part):
+        texts = part['Message'].tolist()
+        labels = {key: part[column].tolist() for key, column in LABEL_COLUMNS.items()}
+        return texts, labels
+
+    return {'train': _split(df[~is_holdout & df['Trainable']]), 'holdout': _split(df[is_holdout])}
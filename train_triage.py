@@ -0,0 +1,54 @@
+import os
+import sys
+import argparse
+from utils.logger import CustomLogger
+from src.triage_classifier import TriageClassifier, load_training_data
+from config import groq_config
+
+
+def main():
+    logger = CustomLogger().get_logger()
+
+    parser = argparse.ArgumentParser(description='Train the local triage model on HIGH confidence LLM verdicts')
+    parser.add_argument('--logs', default='logs', help='Folder containing the Parquet message logs')
+    parser.add_argument('--output', default=groq_config['triage_model_path'], help='Where to save the model')
+    parser.add_argument('--threshold', type=float, default=groq_config['triage_threshold'],
+                        help='Probability above which the model answers locally')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of history held out for evaluation')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--min-votes', type=int, default=3,
+                        help='Minimum model votes for a HIGH confidence verdict to be used for training')
+    args = parser.parse_args()
+
+    data = load_training_data(args.logs, holdout_ratio=args.holdout, min_votes=args.min_votes)
+    train_texts, train_labels = data['train']
+    holdout_texts, holdout_labels = data['holdout']
+    if not train_texts:
+        logger.error(f'No training data found in {args.logs}')
+        print(f'No training data found in {args.logs}')
+        sys.exit(1)
+
+    try:
+        model = TriageClassifier(epochs=args.epochs).fit(train_texts, train_labels)
+    except ValueError as e:
+        print(f'Not enough label variety to train the triage model: {e}')
+        sys.exit(1)
+
+    if holdout_texts:
+        report = model.evaluate(holdout_texts, holdout_labels, args.threshold)
+        print(f"Held-out LLM-analysed messages: {report['samples']}")
+        for key, accuracy in report['field_accuracy'].items():
+            print(f'  {key}: {accuracy:.1%} agreement with LLM labels')
+        print(f"Exact match: {report['exact_match']:.1%}")
+        print(f"Handled locally at threshold {report['threshold']}: {report['coverage']:.1%} "
+              f"(accuracy {report['covered_accuracy']:.1%})")
+    else:
+        logger.warning('No held-out messages, skipping evaluation')
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    model.save(args.output)
+    print(f'Triage model saved to {args.output}')
+
+
+if __name__ == "__main__":
+    main()